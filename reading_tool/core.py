@@ -0,0 +1,334 @@
+import streamlit as st
+import json
+import os
+import asyncio
+import threading
+import time
+from pathlib import Path
+from openai import AsyncOpenAI, OpenAI
+from collections import Counter, namedtuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Constants
+# One JSON object per line so new entries can be appended without rewriting the file
+DATA_PATH = Path("data/saved_entries.jsonl")
+LEGACY_DATA_PATH = Path("data/saved_entries.json")
+FEEDBACK_CACHE_SIZE = 200
+FEEDBACK_CACHE_TTL = 24 * 60 * 60  # seconds
+ALL_FEEDBACK_TYPES = "All Three"
+
+# Model and max_tokens per feedback type; only the reasoning-heavy focus needs the larger
+# model (plain gpt-4 doesn't support JSON responses)
+FEEDBACK_MODELS = {
+    "Writing Skill": ("gpt-4o-mini", 700),
+    "Vocabulary": ("gpt-4o-mini", 700),
+    "Depth of Thinking": ("gpt-4o", 1500)
+}
+
+FEEDBACK_FOCUS = {
+    "Writing Skill": "Writing Skill: grammar, sentence flow, structure, clarity and style.",
+    "Vocabulary": "Vocabulary: word choice, descriptive language and expression; suggest stronger alternatives.",
+    "Depth of Thinking": "Depth of Thinking: comprehension, analysis, reasoning and personal insight about the book."
+}
+
+# The shared rubric comes first and the focus last, so every request starts with the
+# same prefix for OpenAI's automatic prompt caching
+FEEDBACK_RUBRIC = """You give encouraging, constructive feedback on a child's book write-up.
+Respond as JSON with keys:
+- "rating": integer from 1 to 10 for the focus area
+- "summary": string, one or two sentences of overall feedback
+- "strengths": array of strings, what is done well
+- "improvements": array of strings, 3-5 specific, actionable suggestions with concrete
+  examples, ending with a brief rewrite of one section showing the improvement
+Focus only on {focus}"""
+
+FEEDBACK_SECTIONS = [
+    ("summary", "📝 Summary"),
+    ("strengths", "🌟 What You Did Well"),
+    ("improvements", "💡 How to Improve")
+]
+
+def get_api_key():
+    # You'll need to set your OpenAI API key as an environment variable
+    # or use Streamlit secrets: st.secrets["OPENAI_API_KEY"]
+    api_key = os.getenv("OPENAI_API_KEY") or st.secrets.get("OPENAI_API_KEY")
+    if not api_key:
+        st.error("OpenAI API key not found. Please set OPENAI_API_KEY environment variable or add it to Streamlit secrets.")
+        st.stop()
+    return api_key
+
+# Initialize OpenAI client
+@st.cache_resource
+def get_openai_client():
+    return OpenAI(api_key=get_api_key())
+
+FeedbackCache = namedtuple("FeedbackCache", ["entries", "lock"])
+
+# (stored_at, (feedback, rating)) keyed by (book_title, writeup, feedback_type), shared
+# across sessions so resubmitting the same write-up doesn't call the API again
+@st.cache_resource
+def get_feedback_cache():
+    return FeedbackCache({}, threading.Lock())
+
+def recall_feedback(key):
+    cache = get_feedback_cache()
+    with cache.lock:
+        item = cache.entries.get(key)
+        if item is None:
+            return None
+        stored_at, feedback = item
+        if time.time() - stored_at > FEEDBACK_CACHE_TTL:
+            cache.entries.pop(key, None)
+            return None
+        return feedback
+
+def remember_feedback(key, feedback):
+    cache = get_feedback_cache()
+    with cache.lock:
+        cache.entries[key] = (time.time(), feedback)
+        # Drop the oldest entries once the cache is full
+        while len(cache.entries) > FEEDBACK_CACHE_SIZE:
+            cache.entries.pop(next(iter(cache.entries)), None)
+
+def dumps_entry(entry):
+    if orjson:
+        return orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(entry, default=str).encode()
+
+def loads_entry(line):
+    return orjson.loads(line) if orjson else json.loads(line)
+
+# Load or initialize data
+# Keyed on the file's mtime so external edits invalidate the cache as well.
+@st.cache_data(ttl="10m", max_entries=1)
+def load_data(mtime):
+    if not DATA_PATH.exists():
+        return []
+    entries = []
+    skipped = 0
+    try:
+        with open(DATA_PATH, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                # A damaged line (e.g. a write cut short) shouldn't hide the rest of the journal
+                try:
+                    entries.append(loads_entry(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    skipped += 1
+    except FileNotFoundError:
+        return []
+    if skipped:
+        st.warning(f"Skipped {skipped} unreadable line(s) in the data file.")
+    return entries
+
+# Called after every write; coarse mtime resolution could otherwise keep stale results
+def clear_data_caches():
+    load_data.clear()
+    summarize_entries.clear()
+
+def data_mtime():
+    return DATA_PATH.stat().st_mtime if DATA_PATH.exists() else 0.0
+
+# Rewrites the whole file; only needed when entries are removed
+def save_data(entries):
+    try:
+        DATA_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(DATA_PATH, "wb") as f:
+            f.writelines(dumps_entry(e) + b"\n" for e in entries)
+        clear_data_caches()
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+
+def save_new_entry(entry):
+    try:
+        DATA_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(DATA_PATH, "ab+") as f:
+            # Start on a fresh line if the last write was cut short
+            needs_newline = False
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+            f.write((b"\n" if needs_newline else b"") + dumps_entry(entry) + b"\n")
+        clear_data_caches()
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
+
+# One-shot conversion of the old single-document JSON file; the original is kept as a backup
+def migrate_legacy_data():
+    if DATA_PATH.exists() or not LEGACY_DATA_PATH.exists():
+        return
+    try:
+        with open(LEGACY_DATA_PATH, "rb") as f:
+            entries = loads_entry(f.read())
+    except FileNotFoundError:
+        # Another session finished the migration first
+        return
+    except json.JSONDecodeError:
+        # Move the unreadable file aside so it isn't silently abandoned once new entries
+        # create the JSONL file
+        corrupt_path = LEGACY_DATA_PATH.with_suffix(".json.corrupt")
+        try:
+            LEGACY_DATA_PATH.rename(corrupt_path)
+        except FileNotFoundError:
+            return
+        st.error(f"Could not read the old data file; it was moved to {corrupt_path}. Starting with empty data.")
+        return
+    save_data(entries)
+    if DATA_PATH.exists():
+        try:
+            LEGACY_DATA_PATH.rename(LEGACY_DATA_PATH.with_suffix(".json.bak"))
+        except FileNotFoundError:
+            pass
+
+EntrySummary = namedtuple("EntrySummary", ["count", "rated_count", "rating_total", "ratings", "focus_counts"])
+
+# One pass over the saved entries for the sidebar and progress stats; `ratings`
+# holds (date, rating) pairs sorted by date and `focus_counts` (feedback_type, count)
+# pairs, most common first
+@st.cache_data(ttl="10m", max_entries=1)
+def summarize_entries(mtime):
+    entries = load_data(mtime)
+    ratings = []
+    rating_total = 0
+    focus_counts = Counter()
+    for e in entries:
+        if e.get("rating") is not None:
+            ratings.append((e["date"], e["rating"]))
+            rating_total += e["rating"]
+        if e.get("feedback_type"):
+            focus_counts[e["feedback_type"]] += 1
+    ratings.sort(key=lambda r: r[0])
+    return EntrySummary(len(entries), len(ratings), rating_total, ratings, focus_counts.most_common())
+
+# Rating trend indexed by date, rebuilt only when the ratings change
+@st.cache_data(max_entries=4)
+def build_trend_df(ratings):
+    # Imported here so only the progress chart pays for loading pandas
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "Date": pd.to_datetime([date for date, _ in ratings]),
+        "Rating": [rating for _, rating in ratings]
+    })
+    return df.set_index("Date")
+
+def feedback_request(book_title, writeup, feedback_type):
+    """Keyword arguments for the chat completion of one feedback type"""
+    model, max_tokens = FEEDBACK_MODELS[feedback_type]
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": FEEDBACK_RUBRIC.format(focus=FEEDBACK_FOCUS[feedback_type])},
+            {"role": "user", "content": f"Book: {book_title}\n\nWrite-up:\n{writeup}"}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "response_format": {"type": "json_object"}
+    }
+
+def report_feedback_error(message):
+    # Kept in session state rather than shown with st.error so it survives the rerun
+    # that re-enables the submit button
+    previous = st.session_state.get("submit_error")
+    st.session_state.submit_error = f"{previous}\n\n{message}" if previous else message
+
+def read_feedback(response):
+    feedback, rating = parse_feedback(response.choices[0].message.content)
+    return (feedback, rating) if feedback else None
+
+# ChatGPT call
+def get_feedback(book_title, writeup, feedback_type):
+    client = get_openai_client()
+    
+    try:
+        response = client.chat.completions.create(**feedback_request(book_title, writeup, feedback_type))
+        return read_feedback(response)
+    except Exception as e:
+        report_feedback_error(f"Error getting feedback from OpenAI: {e}")
+        return None
+
+async def gather_feedback(api_key, book_title, writeup, feedback_types):
+    # The async client is bound to the event loop, so each asyncio.run gets its own
+    async with AsyncOpenAI(api_key=api_key) as client:
+        semaphore = asyncio.Semaphore(3)
+        
+        async def one(feedback_type):
+            async with semaphore:
+                response = await client.chat.completions.create(
+                    **feedback_request(book_title, writeup, feedback_type)
+                )
+            return read_feedback(response)
+        
+        # One failed area mustn't discard the others, which the caller still caches
+        return await asyncio.gather(*(one(t) for t in feedback_types), return_exceptions=True)
+
+def get_all_feedback(book_title, writeup, feedback_types):
+    """Request several feedback types concurrently; returns {feedback_type: (feedback, rating)}
+    for the ones that succeeded"""
+    # Outside the try: st.stop() on a missing key must not be reported as an OpenAI error
+    api_key = get_api_key()
+    try:
+        results = asyncio.run(gather_feedback(api_key, book_title, writeup, feedback_types))
+    except Exception as e:
+        report_feedback_error(f"Error getting feedback from OpenAI: {e}")
+        return {}
+    
+    fetched = {}
+    for feedback_type, result in zip(feedback_types, results):
+        if isinstance(result, Exception):
+            report_feedback_error(f"Error getting {feedback_type} feedback from OpenAI: {result}")
+        elif result is None:
+            report_feedback_error(f"OpenAI returned empty {feedback_type} feedback.")
+        else:
+            fetched[feedback_type] = result
+    return fetched
+
+def combine_feedback(results):
+    """Merge per-type (feedback, rating) results into one entry's fields; the texts are
+    stored only under "feedbacks" (see feedback_text for a single string)"""
+    ratings = [rating for _, rating in results.values() if rating is not None]
+    return {
+        "feedback_type": ALL_FEEDBACK_TYPES,
+        "rating": round(sum(ratings) / len(ratings)) if ratings else None,
+        "feedbacks": {t: {"feedback": feedback, "rating": rating} for t, (feedback, rating) in results.items()}
+    }
+
+def feedback_text(entry):
+    """The entry's feedback as one markdown string, joining per-type texts if needed"""
+    if entry.get("feedbacks"):
+        return "\n\n".join(f"### {t}\n\n{result['feedback']}" for t, result in entry["feedbacks"].items())
+    return entry.get("feedback", "")
+
+def format_section(value):
+    # Models don't always follow the schema; flatten objects to their values rather
+    # than showing Python reprs
+    if isinstance(value, dict):
+        return " ".join(format_section(v) for v in value.values() if v)
+    if isinstance(value, list):
+        return "\n".join(f"- {format_section(item)}" for item in value if item)
+    return str(value)
+
+def parse_feedback(content):
+    """Turn the model's JSON reply into markdown feedback and a 1-10 rating"""
+    result = orjson.loads(content) if orjson else json.loads(content)
+    
+    sections = []
+    for key, header in FEEDBACK_SECTIONS:
+        value = result.get(key)
+        if not value:
+            continue
+        sections.append(f"#### {header}\n{format_section(value)}")
+    
+    try:
+        rating = int(result.get("rating"))
+    except (TypeError, ValueError):
+        rating = None
+    if rating is not None and not 1 <= rating <= 10:
+        rating = None
+    
+    return "\n\n".join(sections), rating